@@ -4,23 +4,70 @@ import random
 import math
 import os
 import sys
-import pygame
-from dataclasses import dataclass
+import numpy as np
 
 from ui import Simulator, HUD, GraphOverlay
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    # Trapezoidal integral of a sampled value from time s to the last sample (same maths as TimeValue.integrate)
+    @njit(cache=True, fastmath=True)
+    def _integrate_from(t, v, cum, s):
+        n = t.shape[0]
+        i = min(np.searchsorted(t, s, side="right"), n - 1)
+        if s <= t[0]:
+            v_s = v[0]
+        elif s >= t[n-1]:
+            v_s = v[n-1]
+        else:
+            v_s = v[i-1] + (s - t[i-1]) / (t[i] - t[i-1]) * (v[i] - v[i-1])
+        return cum[n-1] - cum[i] + 0.5 * (v[i] + v_s) * (t[i] - s)
+
+    # Per-object version of SpaceTime.get_observed_time_over_scale. prange runs as a plain range
+    # unless the kernel is compiled with parallel=True.
+    def _solve_observed_kernel(distance, t, v, cum, now, c, max_iterations, tolerance):
+        observed = np.empty(distance.shape[0])
+        for k in prange(distance.shape[0]):
+            d = distance[k]
+            time_estimate = 0.0
+            if d >= 1e-6:
+                time_estimate = d / c
+                for _ in range(max_iterations):
+                    a_avg = _integrate_from(t, v, cum, now - time_estimate) / time_estimate
+                    new_time_estimate = a_avg * d / c
+                    if abs(new_time_estimate - time_estimate) < tolerance:
+                        break
+                    time_estimate = 0.5 * (time_estimate + new_time_estimate)
+            observed[k] = now - time_estimate
+        return observed
+
+    _solve_observed = njit(cache=True, fastmath=True)(_solve_observed_kernel)
+    # Thread start-up only pays off for large object counts; compiled lazily on first use. Not cached:
+    # numba's on-disk cache is keyed by function, not compile flags, so it would collide with the serial kernel.
+    _solve_observed_parallel = njit(fastmath=True, parallel=True)(_solve_observed_kernel)
+    PARALLEL_SOLVE_MIN = 10000
 
-@dataclass
-class SpaceObject:
-    dim_pos: list
-    pos: list = None
 
 # Class for storing, interpolating and integrating a single value over time
 class TimeValue:
-    def __init__(self, initial_value=0.0):
+    def __init__(self, initial_value=0.0, capacity=1024, min_dt=0.0):
         self.initial_value = initial_value
         self.value = initial_value
-        self.history = []
+        # Samples closer than min_dt to the one before are merged into the latest sample
+        self.min_dt = min_dt
+        # Set once the value has ever changed, so callers can take constant-value shortcuts
+        self.varies = False
+        # History of (time, value) samples kept in parallel arrays that double when full,
+        # along with the running trapezoidal integral up to each sample
+        self._t = np.empty(capacity, dtype=np.float64)
+        self._v = np.empty_like(self._t)
+        self._cum = np.empty_like(self._t)
+        self._n = 0
 
     # Get the current value
     def get(self):
@@ -28,40 +75,45 @@ class TimeValue:
     
     # Update the value and store
     def update(self, new_value, time):
+        if new_value != self.value:
+            self.varies = True
         self.value = new_value
-        self.history.append((time, self.value))
+        n = self._n
+        if n >= 2 and time - self._t[n-2] < self.min_dt:
+            # Coalesce crowded samples by overwriting the latest one
+            n -= 1
+        elif n == len(self._t):
+            self._t = np.concatenate((self._t, np.empty_like(self._t)))
+            self._v = np.concatenate((self._v, np.empty_like(self._v)))
+            self._cum = np.concatenate((self._cum, np.empty_like(self._cum)))
+        self._t[n] = time
+        self._v[n] = new_value
+        self._cum[n] = self._cum[n-1] + 0.5 * (new_value + self._v[n-1]) * (time - self._t[n-1]) if n else 0.0
+        self._n = n + 1
     
-    # Integrate value from given time until now using trapezoidal rule
+    # Integrate value from given time(s) until now using trapezoidal rule. Accepts a float or an array.
     def integrate(self, start_time):
-        total = 0.0
-        prev_time = self.history[-1][0] if self.history else start_time
-        prev_value = self.get()
-        for t, v in reversed(self.history):
-            if t <= start_time:
-                break
-            dt = prev_time - t
-            total += 0.5 * (prev_value + v) * dt
-            prev_time = t
-            prev_value = v
-        # Use interpolated value at start_time for last part segment
-        dt = prev_time - start_time
-        total += 0.5 * (prev_value + self.get_at_time(start_time)) * dt
-        return total
-
-    # Interpolate value for a given time
+        start_time = np.asarray(start_time, dtype=np.float64)
+        n = self._n
+        if n == 0:
+            return np.zeros_like(start_time)[()]
+        t, v, cum = self._t[:n], self._v[:n], self._cum[:n]
+        # First sample after start_time (or the latest sample if there is none)
+        i = np.minimum(np.searchsorted(t, start_time, side="right"), n - 1)
+        # Whole segments after that sample, plus the interpolated partial segment before it
+        total = cum[-1] - cum[i] + 0.5 * (v[i] + np.interp(start_time, t, v)) * (t[i] - start_time)
+        return total[()]
+
+    # Views of the (times, values, cumulative integral) history arrays
+    def history_arrays(self):
+        n = self._n
+        return self._t[:n], self._v[:n], self._cum[:n]
+
+    # Interpolate value for a given time(s)
     def get_at_time(self, query_time):
-        if not self.history:
-            return self.get()
-        for i in range(len(self.history)-1, -1, -1):
-            t, v = self.history[i]
-            if t <= query_time:
-                if i == len(self.history) - 1:
-                    return v
-                t_next, v_next = self.history[i+1]
-                # Linear interpolation
-                factor = (query_time - t) / (t_next - t)
-                return v + factor * (v_next - v)
-        return self.history[0][1]
+        if self._n == 0:
+            return np.full(np.shape(query_time), self.get())[()]
+        return np.interp(query_time, self._t[:self._n], self._v[:self._n])
 
     # override the math operators like * + - / **to act like a float when interacting with other numbers
     # This allows TimeValue to be used seamlessly in calculations
@@ -125,8 +177,20 @@ class SpaceTime:
     t_lambda: float = 0.0
 
 
-    def __init__(self, objects=None):
-        self.objects = objects or []
+    def __init__(self, dim_pos=None):
+        # Comoving positions of all objects, stored as a single (N, 2) array
+        if dim_pos is None:
+            dim_pos = np.empty((0, 2))
+        self.dim_pos = np.ascontiguousarray(dim_pos, dtype=np.float32)
+        self.pos = self.dim_pos.copy()
+        self.last_observed_time = np.zeros(len(self.dim_pos))
+        # Comoving distance and direction from the observer never change, so compute them once.
+        # Positions are float32; distances stay float64 as they feed the light-travel time solvers.
+        self.distance_dim = np.hypot(self.dim_pos[:, 0], self.dim_pos[:, 1], dtype=np.float64)
+        self.unit_dim = np.divide(self.dim_pos, self.distance_dim[:, None].astype(np.float32),
+                                  out=np.zeros_like(self.dim_pos), where=self.distance_dim[:, None] > 0)
+        self._recompute_cosmo_constants()
+        self._observe = self._select_observer()
 
     def step(self, dt: float, time: float): 
         # Replace with different expansion models
@@ -135,6 +199,8 @@ class SpaceTime:
         # self.constant(dt, time)
         # self.update_light_speed(dt, time)
 
+        self._observe = self._select_observer()
+
 
     def update_light_speed(self, dt: float, time: float):
         self.light_speed.update(self.light_speed.get() * 0.99, time)
@@ -147,69 +213,94 @@ class SpaceTime:
     def constant(self, dt: float, time: float):
         self.scale_factor.update(self.scale_factor.get() + self.expansion_rate * dt, time)
 
-    def lambda_cdm(self, dt: float, time: float):
+    # Precompute the time-independent LambdaCDM terms; call again after changing omega_* or hubble_param
+    def _recompute_cosmo_constants(self):
         self.t_lambda = 2.0 / 3.0 / self.hubble_param / math.sqrt(self.omega_dark_energy)
-        self.scale_factor.update((self.omega_matter / self.omega_dark_energy) ** (1/3) * math.sinh(time / self.t_lambda) ** (2/3), time)
-
+        self._c_norm = (self.omega_matter / self.omega_dark_energy) ** (1/3)
 
-    # For a given time and object, iterate a solution for the time taken for light to reach the observer at position zero.
-    def get_observed_time_over_scale(self, obj, now, max_iterations=10, tolerance=0.01):
-        distance = math.sqrt(obj.pos[0]**2 + obj.pos[1]**2)
-        if distance < 1e-6:
-            return now
-        time_estimate = distance / self.light_speed
+    def lambda_cdm(self, dt: float, time: float):
+        self.scale_factor.update(self._c_norm * math.sinh(time / self.t_lambda) ** (2/3), time)
+
+
+    # Pick the light-travel solver for the current model. While the integrated quantity (a or c) has never
+    # changed, the fixed-point iteration converges to a closed form, so skip it.
+    def _select_observer(self):
+        if self.integrate_on_scale:
+            return self.get_observed_time_over_scale if self.scale_factor.varies else self._observe_closed_form
+        return self.get_observed_time_over_time if self.light_speed.varies else self._observe_closed_form
+
+    def _observe_closed_form(self, distance, now):
+        a = self.scale_factor.get() if self.integrate_on_scale else 1.0
+        return now - a * distance / self.light_speed.get()
+
+    # For a given time and array of object distances, iterate a solution for the time taken for light to reach
+    # the observer at position zero. All objects are solved together; each one stops updating once converged.
+    def get_observed_time_over_scale(self, distance, now, max_iterations=10, tolerance=0.01):
+        c = self.light_speed.get()
+        t, v, cum = self.scale_factor.history_arrays()
+        if njit is not None and len(t):
+            solve = _solve_observed_parallel if len(distance) >= PARALLEL_SOLVE_MIN else _solve_observed
+            return solve(np.asarray(distance, dtype=np.float64), t, v, cum,
+                         float(now), float(c), max_iterations, tolerance)
+        done = distance < 1e-6
+        time_estimate = np.where(done, 0.0, distance / c)
         for _ in range(max_iterations):
-            a_avg = self.scale_factor.integrate(now - time_estimate) / time_estimate
-            new_time_estimate = (a_avg) * distance / self.light_speed
-            if abs(new_time_estimate - time_estimate) < tolerance:
+            active = np.flatnonzero(~done)
+            if active.size == 0:
                 break
-            time_estimate = 0.5 * (time_estimate + new_time_estimate)  # relax the update to help convergence
+            estimate = time_estimate[active]
+            a_avg = self.scale_factor.integrate(now - estimate) / estimate
+            new_time_estimate = a_avg * distance[active] / c
+            converged = np.abs(new_time_estimate - estimate) < tolerance
+            # relax the update to help convergence
+            time_estimate[active] = np.where(converged, estimate, 0.5 * (estimate + new_time_estimate))
+            done[active] = converged
         return now - time_estimate
 
-
-
-    def get_observed_time_over_time(self, obj, now, max_iterations=10, tolerance=0.01):
-        distance = math.sqrt(obj.pos[0]**2 + obj.pos[1]**2)
-        if distance < 1e-6:
-            return now
-        time_estimate = distance / self.light_speed
+    def get_observed_time_over_time(self, distance, now, max_iterations=10, tolerance=0.01):
+        done = distance < 1e-6
+        time_estimate = np.where(done, 0.0, distance / self.light_speed.get())
         for _ in range(max_iterations):
-            c_avg = self.light_speed.integrate(now - time_estimate)/time_estimate
-            new_time_estimate = distance / c_avg
-            if abs(new_time_estimate - time_estimate) < tolerance:
-                time_estimate = new_time_estimate
+            active = np.flatnonzero(~done)
+            if active.size == 0:
                 break
-            time_estimate = 0.5 * (time_estimate + new_time_estimate)  # relax the update to help convergence
+            estimate = time_estimate[active]
+            c_avg = self.light_speed.integrate(now - estimate) / estimate
+            new_time_estimate = distance[active] / c_avg
+            converged = np.abs(new_time_estimate - estimate) < tolerance
+            # relax the update to help convergence
+            time_estimate[active] = np.where(converged, new_time_estimate, 0.5 * (estimate + new_time_estimate))
+            done[active] = converged
         return now - time_estimate
 
+    # Current positions as an (N, 2) array
     def snapshot(self):
-        return [{"pos": [float(o.pos[0]), float(o.pos[1])]} for o in self.objects]
+        return self.pos.copy()
 
+    # Yields an (N, 2) array of positions and a colour for each layer to draw
     def render_from_observer(self, time):
-        for obj in self.objects:
-            obj.pos = [obj.dim_pos[0] * self.scale_factor, obj.dim_pos[1] * self.scale_factor]
-            yield obj.pos, (255, 0, 0)
+        # Bind raw floats once so the array maths never dispatches through TimeValue operators
+        a = float(self.scale_factor.get())
+        c0 = float(self.light_speed.initial_value)
+        self.pos = self.dim_pos * a
+        yield self.pos, (255, 0, 0)
 
-            if self.integrate_on_scale: observed_time = self.get_observed_time_over_scale(obj, time)
-            else: observed_time = self.get_observed_time_over_time(obj, time)
-            scale_at_obs = self.scale_factor.get_at_time(observed_time)
-            pos_at_obs = [obj.dim_pos[0] * scale_at_obs, obj.dim_pos[1] * scale_at_obs]
-            yield pos_at_obs, (0, 255, 0)
+        distance = self.distance_dim * a
+        self.last_observed_time = self._observe(distance, time)
+        scale_at_obs = self.scale_factor.get_at_time(self.last_observed_time)
+        yield self.dim_pos * scale_at_obs.astype(np.float32)[:, None], (0, 255, 0)
 
-            implied_distance = self.light_speed.initial_value * (time - observed_time)
-            implied_pos = [obj.dim_pos[0] * (implied_distance / math.sqrt(obj.dim_pos[0]**2 + obj.dim_pos[1]**2)),
-                           obj.dim_pos[1] * (implied_distance / math.sqrt(obj.dim_pos[0]**2 + obj.dim_pos[1]**2))]
-            yield implied_pos, (0, 0, 255)
+        implied_distance = c0 * (time - self.last_observed_time)
+        yield self.unit_dim * implied_distance.astype(np.float32)[:, None], (0, 0, 255)
 
 def random_space(num=100, spread=200.0):
-    objs = []
+    xs, ys = [], []
     for _ in range(num):
         theta = random.uniform(0, 2 * math.pi)
         r = spread * math.sqrt(random.random())
-        x = r * math.cos(theta)
-        y = r * math.sin(theta)
-        objs.append(SpaceObject([x, y]))
-    return SpaceTime(objs)
+        xs.append(r * math.cos(theta))
+        ys.append(r * math.sin(theta))
+    return SpaceTime(np.stack([xs, ys], axis=1).astype(np.float32))
 
     
 # UI helper functions
@@ -221,21 +312,27 @@ def init_ui(simulator):
 
 def draw(sim):
     """Global draw function that renders the simulation and overlays for the given Simulator instance."""
-    # clear
+    # clear only the areas drawn last frame
     screen = sim.screen
-    screen.fill((0, 0, 0))
+    for rect in sim.dirty_rects:
+        screen.fill((0, 0, 0), rect)
+    rects = []
 
     # draw space objects
+    r = int(sim.dot_size)
     for pos, colour in sim.space.render_from_observer(sim.sim_time):
-        sx, sy = sim.world_to_screen(pos[0], pos[1])
-        r = int(sim.dot_size)
-        pygame.draw.circle(screen, colour, (sx, sy), r)
+        screen_xy = sim.world_to_screen_batch(pos)
+        # cull dots that fall entirely outside the window
+        mask = ((screen_xy[:, 0] >= -r) & (screen_xy[:, 0] < sim.width + r)
+                & (screen_xy[:, 1] >= -r) & (screen_xy[:, 1] < sim.height + r))
+        dot = sim.get_dot_surface(r, colour)
+        rects += screen.blits([(dot, (sx - r, sy - r)) for sx, sy in screen_xy[mask].tolist()])
 
     # draw graph (top-left)
-    sim.graph.draw(screen, None, pos=(10, 10))
+    rects.append(sim.graph.draw(screen, None, pos=(10, 10)))
 
     # draw HUD (top-right)
-    sim.hud.draw(screen, [
+    rects += sim.hud.draw(screen, [
         ("t", f"{sim.sim_time:.2f}s"), 
         ("a", f"{sim.space.scale_factor.get():.2f}"), 
         ("t_Λ", f"{sim.space.t_lambda:.2f}s"),
@@ -245,7 +342,7 @@ def draw(sim):
         ("Red:", "Pos Now"),
     ])
 
-    pygame.display.flip()
+    sim.update_display(rects)
 
 def update_graph(sim):
     # Update the graph data
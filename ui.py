@@ -7,10 +7,110 @@ Simulator.run so overlays are kept outside the Simulator class logic.
 import os
 import time
 import json
-from collections import deque
+import queue
+import threading
+from collections import OrderedDict, deque
 
+import numpy as np
 import pygame
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# Map graph samples to integer pixel coordinates, writing into preallocated int32 arrays
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _scale_points(vals, left, bottom, vx, scale_y, minv, out_x, out_y):
+        for i in range(vals.shape[0]):
+            out_x[i] = int(left + i * vx)
+            out_y[i] = int(bottom - (vals[i] - minv) * scale_y)
+else:
+    def _scale_points(vals, left, bottom, vx, scale_y, minv, out_x, out_y):
+        out_x[:] = left + np.arange(vals.shape[0]) * vx
+        out_y[:] = bottom - (vals - minv) * scale_y
+
+
+class TextCache:
+    """Keeps the last rendered text surface per label, re-rasterizing only when that label's text changes."""
+    def __init__(self, font, max_size=64):
+        self.font = font
+        self.max_size = max_size
+        self._cache = OrderedDict()  # label -> ((text, color), Surface)
+
+    def render(self, label, text, color):
+        entry = self._cache.get(label)
+        if entry is not None and entry[0] == (text, color):
+            self._cache.move_to_end(label)
+            return entry[1]
+        surf = self.font.render(text, True, color).convert_alpha()
+        self._cache[label] = ((text, color), surf)
+        self._cache.move_to_end(label)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return surf
+
+
+class RingBuffer:
+    """Fixed-size float32 history that overwrites its oldest sample once full.
+    Keeps a running min/max with monotonic queues so they never need a full scan.
+    """
+    def __init__(self, size):
+        self._buf = np.empty(size, dtype=np.float32)
+        self._head = 0  # next write index
+        self._len = 0
+        self._count = 0  # total samples ever appended
+        self._minq = deque()  # (index, value), values increasing
+        self._maxq = deque()  # (index, value), values decreasing
+
+    def __len__(self):
+        return self._len
+
+    def append(self, value):
+        size = len(self._buf)
+        self._buf[self._head] = value
+        v = float(self._buf[self._head])
+        self._head = (self._head + 1) % size
+        self._len = min(self._len + 1, size)
+
+        i = self._count
+        self._count += 1
+        while self._minq and self._minq[-1][1] >= v:
+            self._minq.pop()
+        self._minq.append((i, v))
+        while self._maxq and self._maxq[-1][1] <= v:
+            self._maxq.pop()
+        self._maxq.append((i, v))
+        # drop extremes that have been overwritten
+        if self._minq[0][0] <= i - size:
+            self._minq.popleft()
+        if self._maxq[0][0] <= i - size:
+            self._maxq.popleft()
+
+    def min(self):
+        return self._minq[0][1]
+
+    def max(self):
+        return self._maxq[0][1]
+
+    def values(self):
+        """Return the samples, oldest first, as a contiguous array."""
+        if self._len < len(self._buf):
+            return self._buf[:self._len]
+        return np.concatenate((self._buf[self._head:], self._buf[:self._head]))
+
 
 class HUD:
     """Simple top-right HUD renderer for label/value pairs."""
@@ -20,20 +120,31 @@ class HUD:
         self.padding = padding
         self.spacing = spacing
         self.color = color
+        self._text_cache = TextCache(font)
+        self._prefix_cache = {}  # label -> rendered "label: " Surface
 
     def draw(self, surface, items):
+        """Draw the items and return the list of rects that were drawn to."""
+        rects = []
         if not self.font:
-            return
+            return rects
         y = self.padding
+        blits = []
         for label, value in items:
-            text = f"{label}: {value}"
+            # the "label: " prefix never changes, so only the value text is ever re-rendered
             try:
-                surf = self.font.render(str(text), True, self.color)
+                prefix = self._prefix_cache.get(label)
+                if prefix is None:
+                    prefix = self._prefix_cache[label] = self.font.render(f"{label}: ", True, self.color).convert_alpha()
+                value_surf = self._text_cache.render(label, str(value), self.color)
             except Exception:
                 continue
-            x = self.width - surf.get_width() - self.padding
-            surface.blit(surf, (x, y))
-            y += surf.get_height() + self.spacing
+            x = self.width - prefix.get_width() - value_surf.get_width() - self.padding
+            blits.append((prefix, (x, y)))
+            blits.append((value_surf, (x + prefix.get_width(), y)))
+            y += max(prefix.get_height(), value_surf.get_height()) + self.spacing
+        # one blits call for all lines; its returned rects feed the dirty-rect display update
+        return surface.blits(blits)
 
 
 class GraphOverlay:
@@ -43,7 +154,14 @@ class GraphOverlay:
         self.max_points = max_points
         self.size = size
         self.padding = padding
-        self.history = {}  # label -> deque
+        self.history = {}  # label -> RingBuffer
+        # (label, RingBuffer, color) in first-seen order, extended only when a new label appears
+        self._series_view = []
+        self._text_cache = TextCache(font)
+        self._surf = None
+        self._build_surfaces()
+        # set by update(); while clear, draw() reuses the last rendered overlay
+        self._dirty = True
         self.colors = colors or [
             (255, 100, 100),
             (100, 255, 100),
@@ -53,64 +171,82 @@ class GraphOverlay:
         ]
 
     def update(self, items):
+        self._dirty = True
         for label, value in items:
-            if label not in self.history:
-                self.history[label] = deque(maxlen=self.max_points)
+            series = self.history.get(label)
+            if series is None:
+                series = self.history[label] = RingBuffer(self.max_points)
+                color = self.colors[len(self._series_view) % len(self.colors)]
+                self._series_view.append((label, series, color))
             try:
-                self.history[label].append(float(value))
+                series.append(float(value))
             except Exception:
-                self.history[label].append(0.0)
+                series.append(0.0)
+
+    def _build_surfaces(self):
+        # persistent drawing surface plus a pre-rendered background to reset it each frame
+        w, h = self.size
+        self._surf = pygame.Surface((w, h), pygame.SRCALPHA).convert_alpha()
+        self._bg_template = pygame.Surface((w, h), pygame.SRCALPHA).convert_alpha()
+        # semi-transparent background
+        self._bg_template.fill((20, 20, 20, 160))
+        # border
+        pygame.draw.rect(self._bg_template, (255, 255, 255, 40), (0, 0, w, h), 1)
 
     def draw(self, surface, items=None, pos=(10, 10)):
         # if items provided, update history first
         if items:
             self.update(items)
         w, h = self.size
-        surf = pygame.Surface((w, h), pygame.SRCALPHA)
-        # semi-transparent background
-        surf.fill((20, 20, 20, 160))
-        # border
-        pygame.draw.rect(surf, (255, 255, 255, 40), (0, 0, w, h), 1)
+        if self._surf.get_size() != (w, h):
+            self._build_surfaces()
+        elif not self._dirty:
+            return surface.blit(self._surf, pos)
+        surf = self._surf
+        surf.fill((0, 0, 0, 0))
+        surf.blit(self._bg_template, (0, 0))
 
         # draw each series in the order of items if provided, else stable order
-        labels = [lab for lab, _ in (items or [])]
-        if not labels:
-            labels = list(self.history.keys())
+        series_view = self._series_view
+        if items:
+            series_view = [(label, self.history[label], self.colors[idx % len(self.colors)])
+                           for idx, (label, _) in enumerate(items)]
 
-        for idx, label in enumerate(labels):
-            dq = self.history.get(label)
-            if not dq or len(dq) < 2:
+        # plot area is the same for every series
+        left = self.padding
+        right = w - self.padding
+        top = self.padding
+        bottom = h - 18
+        label_blits = []
+        for label, series, color in series_view:
+            if len(series) < 2:
                 continue
-            vals = list(dq)
-            minv = min(vals)
-            maxv = max(vals)
+            vals = series.values()
+            minv = series.min()
+            maxv = series.max()
             if abs(maxv - minv) < 1e-6:
                 minv -= 0.5
                 maxv += 0.5
-            left = self.padding
-            right = w - self.padding
-            top = self.padding
-            bottom = h - 18
             vx = (right - left) / max(1, len(vals) - 1)
             scale_y = (bottom - top) / (maxv - minv)
-            pts = []
-            for i, v in enumerate(vals):
-                x = int(left + i * vx)
-                y = int(bottom - (v - minv) * scale_y)
-                pts.append((x, y))
-            color = self.colors[idx % len(self.colors)]
+            # x and y are written straight into the columns of one (N, 2) int32 array
+            pts = np.empty((len(vals), 2), dtype=np.int32)
+            _scale_points(vals, left, bottom, vx, scale_y, minv, pts[:, 0], pts[:, 1])
+            pts = pts.tolist()
             color_a = (*color, 200)
             pygame.draw.lines(surf, color_a, False, pts, 2)
             # label text (latest value)
             if self.font:
                 try:
                     text = f"{label}: {vals[-1]:.2f}"
-                    txt_s = self.font.render(text, True, (*color, 220))
-                    surf.blit(txt_s, (left, h - 16))
+                    txt_s = self._text_cache.render(label, text, (*color, 220))
+                    label_blits.append((txt_s, (left, h - 16)))
                 except Exception:
                     pass
+        surf.blits(label_blits, doreturn=False)
+        self._dirty = False
 
-        surface.blit(surf, pos)
+        return surface.blit(surf, pos)
 
 
 class Simulator:
@@ -125,58 +261,150 @@ class Simulator:
         self.scale = float(scale)
         self.dot_size = float(dot_size)
         self.save_interval = float(save_interval)
+        # world -> screen affine transform, applied to whole position arrays
+        self._affine = np.array([self.scale, -self.scale], dtype=np.float32)
+        self._offset = np.array([self.width / 2, self.height / 2], dtype=np.float32)
 
         pygame.init()
         pygame.display.set_caption("SpaceTime 2D")
         self.screen = pygame.display.set_mode((self.width, self.height))
+        # screen areas drawn last frame; the draw function clears and refreshes only these
+        self.dirty_rects = [self.screen.get_rect()]
+        # only QUIT and KEYDOWN are handled, so keep everything else (mouse motion etc.) out of the queue
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN])
+        self._keymap = {
+            pygame.K_ESCAPE: self._quit,
+            pygame.K_SPACE: self._toggle_pause,
+            pygame.K_s: self.save_snapshot,
+            pygame.K_PLUS: self._bigger,
+            pygame.K_EQUALS: self._bigger,
+            pygame.K_MINUS: self._smaller,
+            pygame.K_UNDERSCORE: self._smaller,
+        }
         self.clock = pygame.time.Clock()
         self.running = True
         self.paused = False
-        self._last_save = time.time()
+        self._last_save_ms = pygame.time.get_ticks()
         # simulation time (seconds)
         self.sim_time = 0.0
         # overlay placeholders (initialized by init_ui)
         try:
-            pygame.font.init()
             self.font = pygame.font.SysFont(None, 24)
         except Exception:
             self.font = None
         self.hud = None
         self.graph = None
+        # pre-rendered dot surfaces keyed by (radius, colour)
+        self._dot_cache = {}
         self.snapshots_dir = os.path.join(os.path.dirname(__file__), "snapshots")
         os.makedirs(self.snapshots_dir, exist_ok=True)
+        self._snapshot_prefix = os.path.join(self.snapshots_dir, "snapshot_")
+        # snapshots are encoded and written by a background thread so the frame loop never blocks on disk
+        self._snap_q = queue.Queue(maxsize=4)
+        threading.Thread(target=self._snap_worker, daemon=True).start()
 
     def world_to_screen(self, x, y):
-        sx = self.width / 2 + x * self.scale
-        sy = self.height / 2 - y * self.scale
-        return int(sx), int(sy)
+        # single-point wrapper kept for callers outside the batched draw path
+        sx, sy = self.world_to_screen_batch(np.array([x, y], dtype=np.float32)).tolist()
+        return sx, sy
+
+    def world_to_screen_batch(self, pos_arr):
+        """Transform an (N, 2) array of world positions into (N, 2) int32 screen coords."""
+        return np.rint(pos_arr * self._affine + self._offset).astype(np.int32)
+
+    def get_dot_surface(self, r, colour):
+        key = (r, colour)
+        surf = self._dot_cache.get(key)
+        if surf is None:
+            surf = pygame.Surface((2 * r + 1, 2 * r + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surf, colour, (r, r), r)
+            surf = surf.convert_alpha()
+            self._dot_cache[key] = surf
+        return surf
+
+    def update_display(self, rects, full_threshold=0.7, max_rects=100):
+        """Push the areas erased since last frame and the newly drawn rects to the display.
+        Falls back to a full flip when they cover more than full_threshold of the screen, or when
+        there are more than max_rects of them, as per-rect overhead then outweighs the saved copying.
+        """
+        dirty = self.dirty_rects + rects
+        if (len(dirty) > max_rects
+                or sum(r.w * r.h for r in dirty) > full_threshold * self.width * self.height):
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
+        self.dirty_rects = rects
+
+    def _quit(self):
+        self.running = False
+
+    def _toggle_pause(self):
+        self.paused = not self.paused
+
+    def _bigger(self):
+        self.dot_size *= 1.2
+
+    def _smaller(self):
+        self.dot_size /= 1.2
 
     def handle_events(self):
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
                 self.running = False
             elif ev.type == pygame.KEYDOWN:
-                if ev.key == pygame.K_ESCAPE:
-                    self.running = False
-                elif ev.key == pygame.K_SPACE:
-                    self.paused = not self.paused
-                elif ev.key == pygame.K_s:
-                    self.save_snapshot()
-                elif ev.key == pygame.K_PLUS or ev.key == pygame.K_EQUALS:
-                    self.dot_size *= 1.2
-                elif ev.key == pygame.K_MINUS or ev.key == pygame.K_UNDERSCORE:
-                    self.dot_size /= 1.2
+                handler = self._keymap.get(ev.key)
+                if handler:
+                    handler()
 
     def save_snapshot(self):
-        ts = time.time()
-        fname = os.path.join(self.snapshots_dir, f"snapshot_{int(ts * 1000)}.json")
-        data = {"time": ts, "objects": self.space.snapshot()}
-        with open(fname, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        """Queue a copy of the current positions for the snapshot thread; drops the oldest if it falls behind."""
+        item = (time.time(), np.ascontiguousarray(self.space.snapshot(), dtype=np.float32))
+        try:
+            self._snap_q.put_nowait(item)
+        except queue.Full:
+            try:
+                self._snap_q.get_nowait()
+                self._snap_q.task_done()
+            except queue.Empty:
+                pass
+            self._snap_q.put_nowait(item)
+
+    def _snap_worker(self):
+        while True:
+            ts, pos = self._snap_q.get()
+            try:
+                self._write_snapshot(ts, pos)
+            except Exception as e:
+                print("Failed to save snapshot:", e)
+            finally:
+                self._snap_q.task_done()
+
+    def _write_snapshot(self, ts, pos):
+        if msgpack is not None:
+            # binary snapshot: raw float32 position buffer plus its shape
+            fname = f"{self._snapshot_prefix}{int(ts * 1000)}.msgpack"
+            data = msgpack.packb({"time": ts, "shape": list(pos.shape), "pos": pos.tobytes()}, use_bin_type=True)
+        else:
+            fname = f"{self._snapshot_prefix}{int(ts * 1000)}.json"
+            data = {"time": ts, "objects": [{"pos": p} for p in pos.tolist()]}
+            # compact JSON: no indentation whitespace to generate or write
+            if orjson is not None:
+                data = orjson.dumps(data)
+            else:
+                data = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        # write to a temporary file first so readers never see a partial snapshot
+        tmp = fname + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, fname)
         print("Saved snapshot:", fname)
 
     def run(self, target_fps=60, draw_function=None, periodic_functions=None):
         print("Controls: SPACE pause/resume, +/- adjust dot size, S save snapshot, ESC quit")
+        # [func, interval_ms, last_called_ms] per periodic function, built once; last_called_ms starts one
+        # interval back so every function still runs on the first frame
+        schedule = [[func, 1000.0 / rate, -1000.0 / rate] for rate, func in (periodic_functions or [])]
         while self.running:
             dt_ms = self.clock.tick(target_fps)
             dt = dt_ms / 1000.0
@@ -191,19 +419,19 @@ class Simulator:
             if draw_function:
                 draw_function(self)
 
-            if periodic_functions:
-                # Run periodic functions at their specified rates
-                for rate, func in periodic_functions:
-                    if not hasattr(func, "_last_called"): func._last_called = 0
-                    now = time.time()
-                    if (now - func._last_called) >= (1.0 / rate):
-                        func(self)
-                        func._last_called = now
-
-            now = time.time()
-            if self.save_interval > 0 and (now - self._last_save) >= self.save_interval:
+            # one cheap monotonic millisecond read per frame for all scheduling
+            now_ms = pygame.time.get_ticks()
+            # Run periodic functions at their specified rates
+            for entry in schedule:
+                if now_ms - entry[2] >= entry[1]:
+                    entry[0](self)
+                    entry[2] = now_ms
+
+            if self.save_interval > 0 and (now_ms - self._last_save_ms) >= self.save_interval * 1000.0:
                 self.save_snapshot()
-                self._last_save = now
+                self._last_save_ms = now_ms
 
+        # let queued snapshots finish writing before shutting down
+        self._snap_q.join()
         pygame.quit()
 